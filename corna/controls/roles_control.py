@@ -1,7 +1,7 @@
 """Manage roles."""
 
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, List, Optional
 
 from sqlalchemy.orm.query import Query
 from sqlalchemy.orm.scoping import scoped_session as Session
@@ -366,12 +366,7 @@ def permissions_list(
         raise NoneExistingRoleError(
             f"No role named {name} on Corna {domain_name}")
 
-    permissions_map: Dict[str, bool] = perms.perms(role.permissions)
-
-    perm_list: List[str] = [
-        perm for perm, value in permissions_map.items()
-        if value is True
-    ]
+    perm_list: List[str] = list(perms.perm_names(role.permissions))
     return perm_list
 
 
@@ -109,7 +109,7 @@ def can_read(
 
     res: bool = (
         is_owner(session, domain_name, username)
-        or perms.has_perm(corna_permissions, "read")
+        or perms.has_any(corna_permissions, read_perm)
         or _user_has_perm(session, read_perm, domain_name, username)
     )
 
@@ -134,7 +134,7 @@ def can_write(session: Session, domain_name: str, username: str) -> bool:
 
     res: bool = (
         is_owner(session, domain_name, username)
-        or perms.has_perm(corna_permissions, "write")
+        or perms.has_any(corna_permissions, write_perm)
         or _user_has_perm(session, write_perm, domain_name, username)
     )
 
@@ -156,7 +156,7 @@ def can_change_permissions(
 
     res: bool = (
         is_owner(session, domain_name, username)
-        or perms.has_perm(corna_permissions, "change_permissions")
+        or perms.has_any(corna_permissions, change_perm)
         or _user_has_perm(session, change_perm, domain_name, username)
     )
 
@@ -2,7 +2,7 @@
 
 import enum
 import logging
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 logger: logging.Logger = logging.getLogger(__name__)
 
@@ -36,6 +36,13 @@ class CornaPermissions(enum.IntEnum):
 # more info: https://stackoverflow.com/a/19617280
 THRESHOLD: int = (1 << len(CornaPermissions)) - 1
 
+# lower case permission name to its bit, built once so the helpers below do a
+# single dict lookup rather than going through the enum on every call
+_PERM_BITS: Dict[str, int] = {
+    perm.name.lower(): perm.value for perm in CornaPermissions
+}
+_PERM_ITEMS: Tuple[Tuple[str, int], ...] = tuple(_PERM_BITS.items())
+
 
 def create_role(permissions: List[str]) -> int:
     """Create a 'role' based on a given set of permissions.
@@ -46,12 +53,12 @@ def create_role(permissions: List[str]) -> int:
     """
     res: int = 0
     for permission in permissions:
-        perm: str = permission.upper()
-        if not CornaPermissions.has_key(perm):
-            logger.warning("%s not found in CornaPermissions")
+        bit: int = _PERM_BITS.get(permission.lower(), 0)
+        if not bit:
+            logger.warning("%s not found in CornaPermissions", permission)
             continue
 
-        res |= CornaPermissions[perm]
+        res |= bit
 
     return res
 
@@ -64,13 +71,42 @@ def perms(role: int) -> Dict[str, bool]:
         is marked True, else False
     :rtype: Dict[str, bool]
     """
-    out: Dict[str, bool] = {}
-    for key in CornaPermissions:
-        if (key & role) != 0:
-            out[key.name.lower()] = True
-        else:
-            out[key.name.lower()] = False
-    return out
+    return {name: (bit & role) != 0 for name, bit in _PERM_ITEMS}
+
+
+def perm_names(role: int) -> Iterator[str]:
+    """Yield the name of each permission a role has.
+
+    :param int role: the role to check
+    :returns: the names of the permissions set on the role
+    :rtype: Iterator[str]
+    """
+    for name, bit in _PERM_ITEMS:
+        if bit & role:
+            yield name
+
+
+def count_perms(role: int) -> int:
+    """Count the number of permissions a role has.
+
+    :param int role: the role to check
+    :returns: number of permissions set on the role
+    :rtype: int
+    """
+    return (role & THRESHOLD).bit_count()
+
+
+def merge_roles(roles: Iterable[int]) -> int:
+    """Merge several roles into one holding all of their permissions.
+
+    :param Iterable[int] roles: roles to merge
+    :returns: the composite role, 0 if no roles are given
+    :rtype: int
+    """
+    res: int = 0
+    for role in roles:
+        res |= role
+    return res
 
 
 def has_perm(role: int, permission: str) -> bool:
@@ -81,17 +117,36 @@ def has_perm(role: int, permission: str) -> bool:
     :returns: true if role has permission else false
     :rtype: bool
     """
-    perm: str = permission.upper()
-    res: bool = False
-    if CornaPermissions.has_key(perm):
-        # This only works because we are doubling each of the permissions i.e.
-        # setting the left most bit of each permission (1, 2, 4, 8 etc).
-        # As a result, if we '&' a permission against a role, it will typically
-        # result in the original value of the permission being return i.e.
-        # 4 & 4 == 4 or 4 & 2 == 2 because of the fact that each permission
-        # is double the value of the previous perm.
-        res = (CornaPermissions[perm] & role) != 0
-    return res
+    # This only works because we are doubling each of the permissions i.e.
+    # setting the left most bit of each permission (1, 2, 4, 8 etc).
+    # As a result, if we '&' a permission against a role, it will typically
+    # result in the original value of the permission being return i.e.
+    # 4 & 4 == 4 or 4 & 2 == 2 because of the fact that each permission
+    # is double the value of the previous perm.
+    # Unknown permissions map to 0 so they are never granted.
+    return (_PERM_BITS.get(permission.lower(), 0) & role) != 0
+
+
+def has_any(role: int, mask: int) -> bool:
+    """Check if a role has at least one of the permissions in a mask.
+
+    :param int role: the role being checked
+    :param int mask: permissions OR'd together e.g. from `create_role`
+    :returns: true if role has any of the permissions else false
+    :rtype: bool
+    """
+    return (role & mask) != 0
+
+
+def has_all(role: int, mask: int) -> bool:
+    """Check if a role has every permission in a mask.
+
+    :param int role: the role being checked
+    :param int mask: permissions OR'd together e.g. from `create_role`
+    :returns: true if role has all of the permissions else false
+    :rtype: bool
+    """
+    return (role & mask) == mask
 
 
 def remove_perm(role: int, permission: str) -> int:
@@ -103,14 +158,14 @@ def remove_perm(role: int, permission: str) -> int:
         has the permission, else same role will be returned
     rtype: int
     """
-    perm: str = permission.upper()
-    if not CornaPermissions.has_key(perm):
-        logger.warning("there is not permission named %s", perm)
+    bit: int = _PERM_BITS.get(permission.lower(), 0)
+    if not bit:
+        logger.warning("there is not permission named %s", permission)
         # just return role as the permission has not been found in our
         # permissions enum
         return role
 
-    return role & ~CornaPermissions[perm]
+    return role & ~bit
 
 
 def add_perm(role: int, permission: str) -> int:
@@ -118,11 +173,11 @@ def add_perm(role: int, permission: str) -> int:
     :param int role: role to change
     :param str permission: permission to add
     """
-    perm: str = permission.upper()
-    if not CornaPermissions.has_key(perm):
-        logger.warning("there is not permission named %s", perm)
+    bit: int = _PERM_BITS.get(permission.lower(), 0)
+    if not bit:
+        logger.warning("there is not permission named %s", permission)
         # just return role as the permission has not been found in our
         # permissions enum
         return role
 
-    return role | CornaPermissions[perm]
+    return role | bit
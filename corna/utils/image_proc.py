@@ -15,13 +15,18 @@ logger = logging.Logger(__name__)
 
 IMAGE_EXTENSIONS: Set[str] = {"gif", "jpg", "jpeg", "png", "webp"}
 PICTURE_DIR: Optional[str] = os.environ.get("PICTURE_DIR")
-# Using md5 there seems to be some small chance of collisions
-# however, my maths is not good enough to calculate it myself
-# and there seems to be some conflicting points RE answers I've
-# found online.
+# sha256 makes collisions a non-issue for our purposes and, unlike md5,
+# OpenSSL runs it on dedicated CPU instructions (SHA-NI on x86, the
+# crypto extensions on ARMv8) where available, so it is typically faster
+# per byte too. `hash_to_dir` only needs _at least_ 128 bits of output.
 # For more discussion: https://stackoverflow.com/q/201705
-DIGESTMOD: Callable = hashlib.md5
-READ_BYTES: int = 8192
+DIGESTMOD: Callable = hashlib.sha256
+# chunk size fed to the digest, large enough that the per-chunk python
+# overhead is negligible next to the hashing itself
+READ_BYTES: int = 64 * 1024
+# werkzeug copies uploads to disk in 16KB chunks by default, for multi-MB
+# media (video, gifs) a larger buffer means far fewer read/write syscalls.
+WRITE_BYTES: int = 1024 * 1024
 
 
 def random_hash() -> str:
@@ -49,7 +54,7 @@ def hash_image(image_path: FileStorage) -> str:
     digest: object = DIGESTMOD()
 
     while True:
-        # read 8KB chunks
+        # read 64KB chunks
         nxt: bytes = image_path.read(READ_BYTES)
         if not nxt:
             break
@@ -118,7 +123,7 @@ def save(image: FileStorage, bucket: str, hash_: str) -> str:
     full_path: str = f"{directory_path}/{secure_image_name}"
     # save picture
     try:
-        image.save(full_path)
+        image.save(full_path, buffer_size=WRITE_BYTES)
     except OSError as e:
         raise e
 
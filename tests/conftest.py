@@ -7,7 +7,7 @@ import logging
 from flask import request as flask_request
 from greenlet import getcurrent
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import scoped_session, sessionmaker
 import sqltap
 import testing.postgresql
@@ -68,14 +68,32 @@ def test_db_engine():
 
 @pytest.fixture(name='engine', scope='session')
 def _engine():
-    """Session-wide test database."""
+    """Session-wide test database.
+
+    When running in parallel with `pytest -n auto` every xdist worker runs
+    its own session, so each worker gets a postgres instance of its own.
+    """
     with test_db_engine() as engine:
         yield engine
 
 
-@pytest.fixture(name='session_class')
-def _session_class(engine, request):
-    """Session fixture.
+def _restart_sequences(engine):
+    """Reset every sequence in the test database back to its start value.
+
+    Sequences are not transactional in postgres so rolling back a test does
+    not undo any `nextval` calls made during it.
+    """
+    with engine.begin() as connection:
+        names = connection.execute(
+            text("SELECT sequence_name FROM information_schema.sequences")
+        ).scalars().all()
+        for name in names:
+            connection.execute(text(f'ALTER SEQUENCE "{name}" RESTART'))
+
+
+@pytest.fixture(name='tables', scope='session')
+def _tables(engine, request):
+    """Create the schema once for the whole test run.
 
     The engine uses either the ORM models or SQL files to create the schema,
     depending on the `--use-sql-files` flag.
@@ -88,7 +106,7 @@ def _session_class(engine, request):
     else:
         models.Base.metadata.create_all(engine)
 
-    yield sessionmaker(bind=engine)
+    yield
 
     logging.debug("Remove all tables and data")
     if use_sql_files:
@@ -97,6 +115,46 @@ def _session_class(engine, request):
         models.Base.metadata.drop_all(engine)
 
 
+@pytest.fixture(name='connection')
+def _connection(engine, tables):
+    """A connection wrapped in a transaction that is rolled back after a test.
+
+    Everything a test writes happens inside this transaction, so rolling it
+    back leaves an empty database for the next test without having to drop
+    and re-create the schema.
+    """
+    connection = engine.connect()
+    transaction = connection.begin()
+
+    yield connection
+
+    logging.debug("Roll back all data")
+    transaction.rollback()
+    connection.close()
+    _restart_sequences(engine)
+
+
+@pytest.fixture(name='session_class')
+def _session_class(connection):
+    """Session class bound to the per-test connection.
+
+    Sessions work inside a SAVEPOINT which is re-opened every time it ends,
+    so `commit()` and `rollback()` calls made by the app or by a test never
+    reach the outer transaction. This is SQLAlchemy's "Joining a Session into
+    an External Transaction" recipe.
+    """
+    session_class = sessionmaker(bind=connection)
+    nested = connection.begin_nested()
+
+    @event.listens_for(session_class, "after_transaction_end")
+    def _restart_savepoint(*_):
+        nonlocal nested
+        if not nested.is_active:
+            nested = connection.begin_nested()
+
+    yield session_class
+
+
 @pytest.fixture(name='session')
 def _session(session_class):
     """Creates an empty database for a test."""
@@ -106,7 +164,7 @@ def _session(session_class):
     )
 
     yield app_scoped_session
-    app_scoped_session.rollback()  # pylint: disable=no-member
+    app_scoped_session.remove()  # pylint: disable=no-member
 
 
 @pytest.fixture(name='client')
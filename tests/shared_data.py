@@ -1,8 +1,29 @@
 # Shared data for tests
+import functools
+import io
 import pathlib
 
+from sqlalchemy import func
+
 ASSET_DIR = pathlib.Path(__file__).parent.absolute() / "assets"
 
+
+@functools.lru_cache(maxsize=None)
+def asset_bytes(name):
+    """Read a test asset from disk once, later calls are served from memory."""
+    return (ASSET_DIR / name).read_bytes()
+
+
+def asset(name):
+    """Get a fresh in-memory copy of a test asset to upload.
+
+    Returns a `(stream, filename)` pair, which werkzeug's test client
+    accepts in place of an open file. The filename is the full path of the
+    asset so responses are identical to uploading the file from disk.
+    """
+    return io.BytesIO(asset_bytes(name)), f"{ASSET_DIR / name}"
+
+
 corna_info = {
         "domain_name": "some-fake-domain",
         "title": "some-fake-title",
@@ -48,3 +69,17 @@ def mock_post(
 
 
     return post
+
+
+def row_counts(session, *tables):
+    """Count the rows of several tables in one round trip to the db.
+
+    Each table is counted in its own scalar subquery so the tables are
+    never joined together, e.g.
+        SELECT (SELECT count(*) FROM media), (SELECT count(*) FROM images)
+    """
+    counts = [
+        session.query(func.count()).select_from(table).scalar_subquery()
+        for table in tables
+    ]
+    return tuple(session.query(*counts).one())
@@ -64,6 +64,50 @@ def _create_user_helper(session, email, username):
     assert session.query(models.UserTable).count() > 1
 
 
+def _create_user_with_role_helper(
+    session,
+    email,
+    username,
+    role="default",
+    permissions=[],
+):
+    """Create a user holding a role on the test Corna.
+
+    The role, user and their mapping are seeded straight into the db in a
+    single commit, for tests that need such a user but are not testing the
+    roles endpoints themselves.
+    """
+    corna = (
+        session
+        .query(models.CornaTable)
+        .filter(
+            models.CornaTable.domain_name == shared.corna_info["domain_name"]
+        )
+        .one()
+    )
+    now = get_utc_now()
+
+    session.add(
+        models.UserTable(
+            uuid=utils.get_uuid(),
+            email=models.EmailTable(email_address=email, password="Dany"),
+            username=username,
+            date_created=now,
+            roles=[
+                models.Role(
+                    uuid=utils.get_uuid(),
+                    name=role,
+                    created=now,
+                    permissions=perms.create_role(permissions),
+                    creator_uuid=corna.user_uuid,
+                    corna_uuid=corna.uuid,
+                ),
+            ],
+        )
+    )
+    session.commit()
+
+
 def _give_user_role_helper(client, role, user):
 
     # give user role
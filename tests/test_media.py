@@ -1,57 +1,97 @@
 """Tests for media endpoints."""
 
+import hashlib
+import io
 import os
 import sys
 
 import pytest
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
 
 from corna.db import models
 from corna.controls import media_control
-from corna.utils import image_proc
+from corna.utils import get_utc_now, image_proc, utils
 from tests import shared_data
 
+
+# `hash_image` and `random_hash` are stubbed to constants in the tests below
+# so the directory a file gets saved into is always one of these two
+_HASH_BUCKET = "thi/sis/afa/kehash12345"
+_RAND_BUCKET = "thi/sis/afa/kestringhash"
+
+
 @pytest.fixture(autouse=True)
-def _all_media_based_stubs(request, tmpdir, mocker, monkeypatch):
+def _all_media_based_stubs(request, tmp_path, monkeypatch):
     """Environment variable and function mocks needed for post
     related testing.
     """
-    if not ("nostubs" in request.keywords):
-        mocker.patch(
-            "corna.utils.image_proc.hash_image",
-            return_value="thisisafakehash12345",
+    # nothing inspects these calls, so plain functions will do
+    if request.node.get_closest_marker("nostubs") is None:
+        monkeypatch.setattr(
+            image_proc,
+            "hash_image",
+            lambda image: "thisisafakehash12345",
         )
-        mocker.patch(
-            "corna.utils.utils.random_short_string",
-            return_value="abcdef",
+        monkeypatch.setattr(
+            utils,
+            "random_short_string",
+            lambda *args, **kwargs: "abcdef",
         )
-    mocker.patch(
-        "corna.utils.image_proc.random_hash",
-        return_value="thisisafakestringhash",
-    )
     monkeypatch.setattr(
         image_proc,
-        "PICTURE_DIR",
-        tmpdir.mkdir("assets"),
+        "random_hash",
+        lambda: "thisisafakestringhash",
     )
+    assets = tmp_path / "assets"
+    assets.mkdir()
+    monkeypatch.setattr(image_proc, "PICTURE_DIR", assets)
 
 
-def test_upload(session, client, mocker, login):
-    mocker.patch(
-        "corna.utils.utils.get_uuid",
-        return_value="00000000-0000-0000-0000-000000000000",
+def _bucket(type_, use_random=False):
+    """Directory a stubbed upload of `type_` is saved into."""
+    return (
+        image_proc.PICTURE_DIR
+        / type_
+        / (_RAND_BUCKET if use_random else _HASH_BUCKET)
     )
 
-    type_ = "image"
-    image = (shared_data.ASSET_DIR / "anders-jilden.jpg").open("rb")
-    resp = client.post(
+
+def _upload(client, name, type_):
+    """Upload an asset from the test assets dir via the media endpoint."""
+    return client.post(
         "/api/v1/media/upload",
-        data={"image": image, "type": type_},
+        data={"image": shared_data.asset(name), "type": type_},
     )
+
+
+# the asset uploaded for each media type by the `uploaded` fixture
+_UPLOADS = {"image": "anders-jilden.jpg", "video": "big-bunny.mp4"}
+
+
+@pytest.fixture(name="uploaded")
+def _uploaded(request, client, mocker, login):
+    """A single uploaded file as `(type_, resp)`.
+
+    Tests pick the media type with an indirect parametrize on `uploaded`.
+    """
+    type_ = request.param
+    mocker.patch(
+        "corna.utils.utils.get_uuid",
+        return_value="00000000-0000-0000-0000-000000000000",
+    )
+    resp = _upload(client, _UPLOADS[type_], type_)
     assert resp.status_code == 201
+    return type_, resp
+
+
+@pytest.mark.parametrize("uploaded", ["image"], indirect=True)
+def test_upload(session, uploaded):
+    type_, resp = uploaded
 
     expected = {
         "filename": f"{shared_data.ASSET_DIR}/anders-jilden.jpg",
-        "size": os.stat((shared_data.ASSET_DIR / "anders-jilden.jpg")).st_size,
+        "size": len(shared_data.asset_bytes("anders-jilden.jpg")),
         "id": "00000000-0000-0000-0000-000000000000",
         "url_extension": "abcdef",
         "mime_type": "image/jpeg"
@@ -60,18 +100,16 @@ def test_upload(session, client, mocker, login):
     assert resp.json == expected
 
     # ensure file is actually saved
-    expected_path = image_proc.PICTURE_DIR / type_ / "thi/sis/afa/kehash12345"
-    assert expected_path.exists()
-    assert len(expected_path.listdir()) == 1
-    for file in expected_path.listdir():
-        # assert we've saved some data successfully
-        assert os.stat(file).st_size >= 1024
-
-    # make sure db is ok
-    assert session.query(models.Media).count() == 1
-    assert session.query(models.Images).count() == 1
-    # ensure no posts have been created
-    assert session.query(models.PostTable).count() == 0
+    expected_path = _bucket(type_)
+    entries = list(os.scandir(expected_path))
+    assert len(entries) == 1
+    # assert we've saved some data successfully
+    assert entries[0].stat().st_size >= 1024
+
+    # make sure db is ok and ensure no posts have been created
+    assert shared_data.row_counts(
+        session, models.Media, models.Images, models.PostTable,
+    ) == (1, 1, 0)
 
     media = session.query(models.Media).first()
     image = session.query(models.Images).first()
@@ -91,42 +129,46 @@ def test_file_not_saved_properly(session, client, mocker, login):
         side_effect=OSError("Failure")
     )
 
-    image = (shared_data.ASSET_DIR / "anders-jilden.jpg").open("rb")
-    resp = client.post(
-        "/api/v1/media/upload",
-        data={"image": image, "type": "image"},
-    )
+    resp = _upload(client, "anders-jilden.jpg", "image")
     assert resp.status_code == 500
     assert resp.json["message"] == "Unable to save file"
 
     # ensure nothing is saved
-    assert session.query(models.Images).count() == 0
-    assert session.query(models.Media).count() == 0
-
-
-def test_download(session, client, login):
-    # add image
-    type_ = "image"
-    image = (shared_data.ASSET_DIR / "anders-jilden.jpg").open("rb")
-    resp = client.post(
-        "/api/v1/media/upload",
-        data={"image": image, "type": type_},
+    assert shared_data.row_counts(
+        session, models.Images, models.Media) == (0, 0)
+
+
+@pytest.mark.parametrize(
+    "type_, use_random",
+    [
+        ("image", False),
+        # videos are not hashed so they are saved into a random bucket
+        ("video", True),
+    ],
+)
+def test_download(session, type_, use_random):
+    # `download` only reads the media row, so seed one rather than pushing
+    # a real file through the upload endpoint
+    filename = secure_filename(_UPLOADS[type_])
+    bucket = _RAND_BUCKET if use_random else _HASH_BUCKET
+    session.add(
+        models.Media(
+            uuid=utils.get_uuid(),
+            url_extension="abcdef",
+            path=f"{type_}/{bucket}/{filename}",
+            size=1024,
+            created=get_utc_now(),
+            type=type_,
+            orphaned=True,
+        )
     )
-    assert resp.status_code == 201
+    session.commit()
 
     # we dont want to call the main download endpoint as it sends a file
     # so we'll call the download function in media_control directly and 
     # ensure we get the proper path
-    from werkzeug.utils import secure_filename
-    url_extension = resp.json["url_extension"]
-    expected_filename = secure_filename(resp.json["filename"])
-    expected_path = (
-        image_proc.PICTURE_DIR 
-        / type_
-        / "thi/sis/afa/kehash12345" 
-        / expected_filename
-    )
-    assert media_control.download(session, url_extension) == expected_path
+    expected_path = _bucket(type_, use_random) / filename
+    assert media_control.download(session, "abcdef") == str(expected_path)
 
 
 def test_download_fail(client):
@@ -136,23 +178,14 @@ def test_download_fail(client):
     assert resp.json["message"] == "File not found"
 
 
-def test_upload_video(session, client, mocker, login):
-    mocker.patch(
-        "corna.utils.utils.get_uuid",
-        return_value="00000000-0000-0000-0000-000000000000",
-    )
-
-    type_ = "video"
-    image = (shared_data.ASSET_DIR / "big-bunny.mp4").open("rb")
-    resp = client.post(
-        "/api/v1/media/upload",
-        data={"image": image, "type": type_},
-    )
-    assert resp.status_code == 201
+@pytest.mark.slow
+@pytest.mark.parametrize("uploaded", ["video"], indirect=True)
+def test_upload_video(session, uploaded):
+    type_, resp = uploaded
 
     expected = {
         "filename": f"{shared_data.ASSET_DIR}/big-bunny.mp4",
-        "size": os.stat((shared_data.ASSET_DIR / "big-bunny.mp4")).st_size,
+        "size": len(shared_data.asset_bytes("big-bunny.mp4")),
         "id": "00000000-0000-0000-0000-000000000000",
         "url_extension": "abcdef",
         "mime_type": "video/mp4"
@@ -161,19 +194,16 @@ def test_upload_video(session, client, mocker, login):
     assert resp.json == expected
 
     # ensure file is actually saved
-    expected_path = image_proc.PICTURE_DIR / type_ / "thi/sis/afa/kestringhash"
-    assert expected_path.exists()
-    assert len(expected_path.listdir()) == 1
-    for file in expected_path.listdir():
-        # assert we've saved some data successfully
-        assert os.stat(file).st_size >= 1024
-
-    # make sure db is ok
-    assert session.query(models.Media).count() == 1
-    # ensure no images were created
-    assert session.query(models.Images).count() == 0
-    # ensure no posts have been created
-    assert session.query(models.PostTable).count() == 0
+    expected_path = _bucket(type_, use_random=True)
+    entries = list(os.scandir(expected_path))
+    assert len(entries) == 1
+    # assert we've saved some data successfully
+    assert entries[0].stat().st_size >= 1024
+
+    # make sure db is ok, ensure no images or posts were created
+    assert shared_data.row_counts(
+        session, models.Media, models.Images, models.PostTable,
+    ) == (1, 0, 0)
 
     media = session.query(models.Media).first()
     assert media is not None
@@ -183,30 +213,7 @@ def test_upload_video(session, client, mocker, login):
     assert media.orphaned == True
 
 
-def test_download_video(session, client, login):
-    type_ = "video"
-    image = (shared_data.ASSET_DIR / "big-bunny.mp4").open("rb")
-    resp = client.post(
-        "/api/v1/media/upload",
-        data={"image": image, "type": type_},
-    )
-    assert resp.status_code == 201
-
-    # we dont want to call the main download endpoint as it sends a file
-    # so we'll call the download function in media_control directly and 
-    # ensure we get the proper path
-    from werkzeug.utils import secure_filename
-    url_extension = resp.json["url_extension"]
-    expected_filename = secure_filename(resp.json["filename"])
-    expected_path = (
-        image_proc.PICTURE_DIR 
-        / type_
-        / "thi/sis/afa/kestringhash" 
-        / expected_filename
-    )
-    assert media_control.download(session, url_extension) == expected_path
-
-
+@pytest.mark.slow
 def test_upload_gif_with_dot_gif_extension(session, client, mocker, login):
     mocker.patch(
         "corna.utils.utils.get_uuid",
@@ -214,16 +221,12 @@ def test_upload_gif_with_dot_gif_extension(session, client, mocker, login):
     )
 
     type_ = "gif"
-    image = (shared_data.ASSET_DIR / "earth.gif").open("rb")
-    resp = client.post(
-        "/api/v1/media/upload",
-        data={"image": image, "type": type_},
-    )
+    resp = _upload(client, "earth.gif", type_)
     assert resp.status_code == 201
 
     expected = {
         "filename": f"{shared_data.ASSET_DIR}/earth.gif",
-        "size": os.stat((shared_data.ASSET_DIR / "earth.gif")).st_size,
+        "size": len(shared_data.asset_bytes("earth.gif")),
         "id": "00000000-0000-0000-0000-000000000000",
         "url_extension": "abcdef",
         "mime_type": "image/gif"
@@ -232,19 +235,16 @@ def test_upload_gif_with_dot_gif_extension(session, client, mocker, login):
     assert resp.json == expected
 
     # ensure file is actually saved
-    expected_path = image_proc.PICTURE_DIR / type_ / "thi/sis/afa/kehash12345"
-    assert expected_path.exists()
-    assert len(expected_path.listdir()) == 1
-    for file in expected_path.listdir():
-        # assert we've saved some data successfully
-        assert os.stat(file).st_size >= 1024
-
-    # make sure db is ok
-    assert session.query(models.Media).count() == 1
-    # ensure no images were created
-    assert session.query(models.Images).count() == 1
-    # ensure no posts have been created
-    assert session.query(models.PostTable).count() == 0
+    expected_path = _bucket(type_)
+    entries = list(os.scandir(expected_path))
+    assert len(entries) == 1
+    # assert we've saved some data successfully
+    assert entries[0].stat().st_size >= 1024
+
+    # make sure db is ok, ensure an image but no posts were created
+    assert shared_data.row_counts(
+        session, models.Media, models.Images, models.PostTable,
+    ) == (1, 1, 0)
 
     media = session.query(models.Media).first()
     assert media is not None
@@ -279,16 +279,12 @@ def test_upload_image_with_webp_format(client, mocker, login):
 
     filename = shared_data.ASSET_DIR / "giphy.webp"
     type_ = "gif"
-    image = filename.open("rb")
-    resp = client.post(
-        "/api/v1/media/upload",
-        data={"image": image, "type": type_},
-    )
+    resp = _upload(client, "giphy.webp", type_)
     assert resp.status_code == 201
 
     expected = {
         "filename": f"{filename}",
-        "size": os.stat(filename).st_size,
+        "size": len(shared_data.asset_bytes("giphy.webp")),
         "id": "00000000-0000-0000-0000-000000000000",
         "url_extension": "abcdef",
         # this line fails as webp is not a recognised format until python3.11
@@ -306,35 +302,20 @@ def test_path_collision(session, client, capsys, mocker, login):
         return_value="00000000-0000-0000-0000-000000000000",
     )
 
-    assets = image_proc.PICTURE_DIR
-
     type_ = "image"
-    image = (shared_data.ASSET_DIR / "anders-jilden.jpg").open("rb")
-    resp = client.post(
-        "/api/v1/media/upload",
-        data={"image": image, "type": type_},
-    )
+    resp = _upload(client, "anders-jilden.jpg", type_)
     assert resp.status_code == 201
 
     # ensure file is actually saved
     assert session.query(models.Media).count() == 1
     path = session.query(models.Media).first().path
-    expected_path = (image_proc.PICTURE_DIR / path).parts()[-2]
-    assert len(expected_path.listdir()) == 1
-
-    # write picture to tmpdir to use again
-    import shutil
-    shutil.copy(
-        (shared_data.ASSET_DIR / "anders-jilden.jpg"),
-        (assets / "same-pic-different-name.jpg")
-    )
+    expected_path = (image_proc.PICTURE_DIR / path).parent
+    assert len(list(expected_path.iterdir())) == 1
 
-    assert (assets / "same-pic-different-name.jpg").exists()
     # putting it into the same file should raise a FileExistsError
     # but should still be saved
-    from werkzeug.datastructures import FileStorage
     file = FileStorage(
-        stream=(assets / "same-pic-different-name.jpg").open("rb"),
+        stream=io.BytesIO(shared_data.asset_bytes("anders-jilden.jpg")),
         filename="same-pic-different-name.jpg"
     )
     image_hash = image_proc.hash_image(file)
@@ -343,7 +324,7 @@ def test_path_collision(session, client, capsys, mocker, login):
     captured = capsys.readouterr()
     assert "Photo directory exists, duplicate?" in captured.err
 
-    assert len(expected_path.listdir()) == 2
+    assert len(list(expected_path.iterdir())) == 2
 
 
 
@@ -360,61 +341,61 @@ def test_nothing_saved_in_database_if_image_save_fails(
     )
 
     type_ = "image"
-    image = (shared_data.ASSET_DIR / "anders-jilden.jpg").open("rb")
-    resp = client.post(
-        "/api/v1/media/upload",
-        data={"image": image, "type": type_},
-    )
+    resp = _upload(client, "anders-jilden.jpg", type_)
 
     assert resp.status_code == 500
     assert resp.json["message"] == "Unable to save file"
 
-    assert session.query(models.Media).count() == 0
-    assert session.query(models.Images).count() == 0
+    assert shared_data.row_counts(
+        session, models.Media, models.Images) == (0, 0)
 
 
 @pytest.mark.nostubs
 def test_hash_gif():
     name = "giphy.webp"
-    file = (shared_data.ASSET_DIR / name) 
-    assert file.exists()
-
-    from werkzeug.datastructures import FileStorage
-    file = FileStorage(stream=file.open("rb"), filename=name)
+    file = FileStorage(
+        stream=io.BytesIO(shared_data.asset_bytes(name)),
+        filename=name,
+    )
     image_hash = image_proc.hash_image(file)
-    # this hash is returned when MD5 receives 0 data as input
-    # i.e. the MD5sum of "nothing"
-    # more info: https://stackoverflow.com/q/10909976
-    empty_hash = "d41d8cd98f00b204e9800998ecf8427e"
-    assert image_hash != empty_hash
+    # hashing in chunks must give the same digest as hashing the whole file
+    expected = hashlib.sha256(shared_data.asset_bytes(name)).hexdigest()
+    assert image_hash == expected
 
 
-@pytest.mark.nostubs
 def test_random_avatar_gen(client, session, login):
-    # upload avatars and one extra image to make sure it does not
-    # get selected
-    image = (shared_data.ASSET_DIR / "anders-jilden.jpg").open("rb")
-    resp = client.post(
-        "/api/v1/media/upload",
-        data={"image": image, "type": "image"},
-    )
+    # upload one regular image to make sure it does not get selected
+    resp = _upload(client, "anders-jilden.jpg", "image")
     assert resp.status_code == 201
     reg_slug = resp.json["url_extension"]
 
-    # upload avatars
-    av_slugs = set()
-    for avatar in ("blue", "coral", "green", "pink", "purple", "yellow"):
-        image = (shared_data.ASSET_DIR / f"avatar-{avatar}.png").open("rb")
-        resp = client.post(
-            "/api/v1/media/upload",
-            data={"image": image, "type": "avatar"},
-        )
-        assert resp.status_code == 201
-
-        av_slugs.add(resp.json["url_extension"])
+    # the avatar endpoint only reads rows from the db, so the avatars are
+    # seeded directly rather than going through the upload endpoint
+    now = get_utc_now()
+    colours = ("blue", "coral", "green", "pink", "purple", "yellow")
+    images = [{"uuid": utils.get_uuid(), "hash": colour} for colour in colours]
+    session.bulk_insert_mappings(models.Images, images)
+    session.bulk_insert_mappings(
+        models.Media,
+        [
+            {
+                "uuid": utils.get_uuid(),
+                "url_extension": f"avatar-{colour}",
+                "path": f"avatar/{colour}/avatar-{colour}.png",
+                "size": 1024,
+                "created": now,
+                "type": "avatar",
+                "orphaned": False,
+                "image_uuid": image["uuid"],
+            }
+            for colour, image in zip(colours, images)
+        ],
+    )
+    session.commit()
+    av_slugs = {f"avatar-{colour}" for colour in colours}
 
-    assert session.query(models.Media).count() == 7
-    assert session.query(models.Images).count() == 7
+    assert shared_data.row_counts(
+        session, models.Media, models.Images) == (7, 7)
 
     # ---------------------- test starts --------------------------
 
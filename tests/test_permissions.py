@@ -66,6 +66,23 @@ def test_has_perm(perm_list, check_perm, expected):
     assert perms.has_perm(role, check_perm) == expected
 
 
+@pytest.mark.parametrize("perm_list,mask_list,any_,all_",
+    [
+        ([], ["read"], False, False),
+        (["read"], [], False, True),
+        (["read"], ["read"], True, True),
+        (["read", "write", "edit"], ["read", "write"], True, True),
+        (["read", "comment"], ["read", "write"], True, False),
+        (["like", "follow"], ["read", "write"], False, False),
+    ]
+)
+def test_has_any_and_has_all(perm_list, mask_list, any_, all_):
+    role = perms.create_role(perm_list)
+    mask = perms.create_role(mask_list)
+    assert perms.has_any(role, mask) == any_
+    assert perms.has_all(role, mask) == all_
+
+
 @pytest.mark.parametrize("perm_list,perm_to_add",
     [
         ([], "read"),
@@ -143,3 +160,34 @@ def test_composite_role__with_overlapping_perms():
     editor = perms.create_role(["edit", "write"])
     # ensure composite has correct perms
     assert (reader | editor) == 7
+
+
+def test_merge_roles():
+    reader = perms.create_role(["read"])
+    editor = perms.create_role(["edit", "write"])
+    assert perms.merge_roles([reader, editor]) == 7
+
+
+def test_merge_roles__with_overlapping_perms():
+    reader = perms.create_role(["read", "write"])
+    editor = perms.create_role(["edit", "write"])
+    assert perms.merge_roles([reader, editor]) == 7
+
+
+def test_merge_roles__no_roles():
+    assert perms.merge_roles([]) == 0
+
+
+@pytest.mark.parametrize("perm_list",
+    [
+        ([]),
+        (["read"]),
+        (["read", "write", "edit"]),
+        (["read", "comment", "like", "follow"]),
+        (["write", "edit", "delete", "change_theme", "change_permissions"]),
+    ]
+)
+def test_perm_names(perm_list):
+    role = perms.create_role(perm_list)
+    assert sorted(perms.perm_names(role)) == sorted(perm_list)
+    assert perms.count_perms(role) == len(perm_list)
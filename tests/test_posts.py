@@ -1,39 +1,28 @@
-import json
 import os
 
 from freezegun import freeze_time
 import pytest
-import requests
-import werkzeug
+from sqlalchemy.orm import joinedload
+from werkzeug.utils import secure_filename
 
 from corna import enums
-from corna.controls import post_control
 from corna.db import models
 from corna.utils import utils, image_proc
 from tests import shared_data
 
 
 FROZEN_TIME = "2023-04-29T03:21:34"
-
-
-def convert_bytes(num):
-    """
-    this function will convert bytes to MB.... GB... etc
-    """
-    for x in ['bytes', 'KB', 'MB', 'GB', 'TB']:
-        if num < 1024.0:
-            return f'{num:.1f} {x}'
-        num /= 1024.0
+_POST_URL = f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post"
 
 
 def _upload_single_image(session, client, type_="image"):
     """Post a single image to the db/filesystem."""
 
     if type_ == "image":
-        file = (shared_data.ASSET_DIR / "anders-jilden.jpg").open("rb")
+        file = shared_data.asset("anders-jilden.jpg")
 
     if type_ == "video":
-        file = (shared_data.ASSET_DIR / "big-bunny.mp4").open("rb")
+        file = shared_data.asset("big-bunny.mp4")
 
     resp = client.post(
         "/api/v1/media/upload",
@@ -46,8 +35,45 @@ def _upload_single_image(session, client, type_="image"):
     return resp.json
 
 
+def _corna(session):
+    """Fetch the Corna created by the `corna` fixture."""
+    return (
+        session
+        .query(models.CornaTable)
+        .filter(
+            models.CornaTable.domain_name
+            == shared_data.corna_info["domain_name"]
+        )
+        .one()
+    )
+
+
+def _only_post(session):
+    """Fetch the single post in the db along with its text and media."""
+    return (
+        session
+        .query(models.PostTable)
+        .options(
+            joinedload(models.PostTable.text),
+            joinedload(models.PostTable.media),
+        )
+        .one()
+    )
+
+
+@pytest.fixture(autouse=True, scope="module")
+def _frozen_time():
+    """Freeze time once for the whole module.
+
+    Starting freezegun means patching every loaded module, doing it once
+    here is much cheaper than decorating each test.
+    """
+    with freeze_time(FROZEN_TIME):
+        yield
+
+
 @pytest.fixture(autouse=True)
-def _all_post_based_stubs(request, tmpdir, mocker, monkeypatch):
+def _all_post_based_stubs(request, tmp_path_factory, monkeypatch):
     """Environment variable and function mocks needed for post
     related testing.
     """
@@ -56,23 +82,38 @@ def _all_post_based_stubs(request, tmpdir, mocker, monkeypatch):
     # fixtures".
     #
     # [1] https://docs.pytest.org/en/7.4.x/how-to/fixtures.html
-    if not ("nostubs" in request.keywords):
-        mocker.patch(
-            "corna.utils.utils.random_short_string",
-            return_value="abcdef",
+    if request.node.get_closest_marker("nostubs") is None:
+        monkeypatch.setattr(
+            utils,
+            "random_short_string",
+            lambda *args, **kwargs: "abcdef",
         )
-    mocker.patch(
-        "corna.utils.image_proc.hash_image",
-        return_value="thisisafakehash12345",
+    monkeypatch.setattr(
+        image_proc,
+        "hash_image",
+        lambda image: "thisisafakehash12345",
     )
+    # a fresh numbered dir under the session's base temp dir, a single mkdir
+    # rather than a per-test tmpdir plus an "assets" dir inside it
     monkeypatch.setattr(
         image_proc,
         "PICTURE_DIR",
-        tmpdir.mkdir("assets"),
-    )
+        tmp_path_factory.mktemp("assets"),
+    )
+    # tests that never look at the saved file can skip writing it to disk,
+    # `size` has to be faked as well since it stats the written file
+    if request.node.get_closest_marker("fakesave") is not None:
+        monkeypatch.setattr(
+            image_proc,
+            "save",
+            lambda image, bucket, hash_: (
+                f"{bucket}/{image_proc.hash_to_dir(hash_)}/"
+                f"{secure_filename(image.filename)}"
+            ),
+        )
+        monkeypatch.setattr(image_proc, "size", lambda path: 2048)
 
 
-@freeze_time(FROZEN_TIME)
 def test_create_post(session, client, corna):
     out_post = shared_data.mock_post(
         with_content=True,
@@ -80,28 +121,15 @@ def test_create_post(session, client, corna):
         with_image=False,
     )
     resp = client.post(
-        f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post",
+        _POST_URL,
         json=out_post,
     )
     assert resp.status_code == 201
 
     # check database relationships are correct
-    posts = session.query(models.PostTable).all()
-    assert len(posts) == 1
-
-    corna = (
-        session
-        .query(models.CornaTable)
-        .filter(
-            models.CornaTable.domain_name
-            == shared_data.corna_info["domain_name"]
-        )
-        .one()
-    )
-    assert len(corna.posts) == 1
-
-    post = session.query(models.PostTable).first()
-    text = session.query(models.TextContent).first()
+    corna = _corna(session)
+    post = _only_post(session)
+    text = post.text
     
     # checking foreign key relationships
     assert post.corna_uuid == corna.uuid
@@ -116,7 +144,6 @@ def test_create_post(session, client, corna):
     assert text.title == out_post["title"]
 
 
-@freeze_time(FROZEN_TIME)
 @pytest.mark.parametrize("with_image,expected", [(False, 400), (True, 201)])
 def test_post_with_picture(session, client, corna, with_image, expected):
     # create image
@@ -129,7 +156,7 @@ def test_post_with_picture(session, client, corna, with_image, expected):
         with_image=with_image
     )
     resp = client.post(
-        f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post",
+        _POST_URL,
         json=out_post
     )
     assert resp.status_code == expected
@@ -138,30 +165,17 @@ def test_post_with_picture(session, client, corna, with_image, expected):
     if not with_image: return
 
     expected_path = assets / "image" / "thi/sis/afa/kehash12345"
-    assert expected_path.exists()
-    assert len(expected_path.listdir()) == 1
-    for file in expected_path.listdir():
-        # assert we've saved some data successfully
-        assert os.stat(file).st_size >= 1024
+    entries = list(os.scandir(expected_path))
+    assert len(entries) == 1
+    # assert we've saved some data successfully
+    assert entries[0].stat().st_size >= 1024
 
-    image_basename = expected_path.listdir()[0].basename
+    image_basename = entries[0].name
     # ensure database relationships are correct
-    posts = session.query(models.PostTable).all()
-    assert len(posts) == 1
-
-    corna = (
-        session
-        .query(models.CornaTable)
-        .filter(
-            models.CornaTable.domain_name
-            == shared_data.corna_info["domain_name"]
-        )
-        .one()
-    )
-    assert len(corna.posts) == 1
-    post = session.query(models.PostTable).first()
-    pic = session.query(models.Media).first()
-    text = session.query(models.TextContent).first()
+    corna = _corna(session)
+    post = _only_post(session)
+    (pic,) = post.media
+    text = post.text
 
     # checking foreign key relationships
     assert post.corna_uuid == corna.uuid
@@ -182,52 +196,34 @@ def test_post_with_picture(session, client, corna, with_image, expected):
     assert session.query(models.Images).count() == 1
 
 
-def test_when_user_not_logged_in_client_text_post(session, client):
+@pytest.mark.parametrize("cookie,payload_kind",
+    [
+        # no session at all, posting both json and form data
+        (None, "json"),
+        (None, "data"),
+        # an owner who is logged in but whose cookie has been tampered with
+        ("this-is-a-fake-cookie", "json"),
+    ]
+)
+def test_login_required(request, session, client, cookie, payload_kind):
     out_post = shared_data.mock_post(
         with_content=True,
         with_title=True,
     )
-    resp = client.post(
-        f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post",
-        json=out_post
-    )
-    assert resp.status_code == 401
-    assert "Login required for this action" in resp.json["message"]
-
-
-def test_when_user_not_logged_in_client(session, client):
-    out_post = shared_data.mock_post(
-        with_content=True,
-        with_title=True,
-        with_image=False,
-    )
-    resp = client.post(
-        f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post",
-        data=out_post
-    )
-    assert resp.status_code == 401
-    assert "Login required for this action" in resp.json["message"]
-
+    if cookie is not None:
+        request.getfixturevalue("corna")
+        client.set_cookie(
+            path="/",
+            key=enums.SessionNames.SESSION.value,
+            value=cookie,
+        )
 
-def test_user_attempt_with_invalid_cookie(session, client, corna):
-    out_post = shared_data.mock_post(
-        with_content=True,
-        with_title=True,
-        with_image=False,
-    )
-    client.set_cookie(
-        path="/",
-        key=enums.SessionNames.SESSION.value,
-        value="this-is-a-fake-cookie"
-    )
-    resp = client.post(
-        f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post",
-        json=out_post
-    )
+    resp = client.post(_POST_URL, **{payload_kind: out_post})
     assert resp.status_code == 401
     assert "Login required for this action" in resp.json["message"]
 
 
+@pytest.mark.fakesave
 def test_linking_preloaded_images(session, client, corna):
     # create image
     _upload_single_image(session, client)
@@ -239,18 +235,17 @@ def test_linking_preloaded_images(session, client, corna):
     )
 
     resp = client.post(
-        f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post",
+        _POST_URL,
         json=out_post,
     )
     assert resp.status_code == 201
 
     # ensure we only still have one image and one post saved
-    assert session.query(models.Images).count() == 1
-    assert session.query(models.PostTable).count() == 1
+    assert shared_data.row_counts(
+        session, models.Images, models.PostTable) == (1, 1)
 
     # ensure relationships are correct
-    post = session.query(models.PostTable).first()
-    assert post is not None
+    post = _only_post(session)
     assert len(post.media) == 1
 
     image = post.media[0]
@@ -259,6 +254,7 @@ def test_linking_preloaded_images(session, client, corna):
 
 
 @pytest.mark.nostubs
+@pytest.mark.fakesave
 def test_linking_multiple_images(session, client, corna):
     # create multiple image
     image_urls = []
@@ -273,18 +269,17 @@ def test_linking_multiple_images(session, client, corna):
     # change uploaded images to our current list
     out_post["uploaded_images"] = image_urls
     resp = client.post(
-        f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post",
+        _POST_URL,
         json=out_post,
     )
     assert resp.status_code == 201
 
     # ensure we two images and one post saved
-    assert session.query(models.Images).count() == 2
-    assert session.query(models.PostTable).count() == 1
+    assert shared_data.row_counts(
+        session, models.Images, models.PostTable) == (2, 1)
 
     # ensure relationships are correct
-    post = session.query(models.PostTable).first()
-    assert post is not None
+    post = _only_post(session)
     assert len(post.media) == 2
 
     for image in post.media:
@@ -301,7 +296,7 @@ def test_linking_to_none_existing_image(session, client, corna):
     )
     out_post["uploaded_images"] = ["defghi"]
     resp = client.post(
-        f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post",
+        _POST_URL,
         json=out_post,
     )
     assert resp.status_code == 400
@@ -317,21 +312,19 @@ def test_post_with_no_title(session, client, corna):
     )
 
     resp = client.post(
-        f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post",
-        json=shared_data.mock_post(with_content=True),
+        _POST_URL,
+        json=out_post,
     )
     assert resp.status_code == 201
-    assert session.query(models.PostTable).count() == 1
-    assert session.query(models.TextContent).count() == 1
+    assert shared_data.row_counts(
+        session, models.PostTable, models.TextContent) == (1, 1)
 
 
-@freeze_time(FROZEN_TIME)
 def test_none_owner_user_create_post(client, session, corna):
     from tests import test_checks
 
-    test_checks._create_role_helper(client, name="default", permissions=["write"])
-    test_checks._create_user_helper(session, "fake@user.com", "fake_user")
-    test_checks._give_user_role_helper(client, "default",  "fake_user")
+    test_checks._create_user_with_role_helper(
+        session, "fake@user.com", "fake_user", permissions=["write"])
 
     # logout
     resp = client.post("/api/v1/auth/logout")
@@ -352,28 +345,15 @@ def test_none_owner_user_create_post(client, session, corna):
         with_image=False,
     )
     resp = client.post(
-        f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post",
+        _POST_URL,
         json=out_post,
     )
     assert resp.status_code == 201
 
     # check database relationships are correct
-    posts = session.query(models.PostTable).all()
-    assert len(posts) == 1
-
-    corna = (
-        session
-        .query(models.CornaTable)
-        .filter(
-            models.CornaTable.domain_name
-            == shared_data.corna_info["domain_name"]
-        )
-        .one()
-    )
-    assert len(corna.posts) == 1
-
-    post = session.query(models.PostTable).first()
-    text = session.query(models.TextContent).first()
+    corna = _corna(session)
+    post = _only_post(session)
+    text = post.text
     
     # checking foreign key relationships
     assert post.corna_uuid == corna.uuid
@@ -396,7 +376,6 @@ def test_none_owner_user_create_post(client, session, corna):
     assert user.username == "fake_user"
 
 
-@freeze_time(FROZEN_TIME)
 def test_none_owner_not_allowed_to_create_post(client, session, corna):
     from tests import test_checks
     test_checks._create_user_helper(session, "fake@user.com", "fake_user")
@@ -420,14 +399,14 @@ def test_none_owner_not_allowed_to_create_post(client, session, corna):
         with_image=False,
     )
     resp = client.post(
-        f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post",
+        _POST_URL,
         json=out_post,
     )
     assert resp.status_code == 401
     assert resp.json["message"] == "User unauthorized to create posts"
 
 
-@freeze_time(FROZEN_TIME)
+@pytest.mark.slow
 def test_vido_post(session, client, mocker, corna):
     mocker.patch(
         "corna.utils.image_proc.random_hash",
@@ -437,51 +416,30 @@ def test_vido_post(session, client, mocker, corna):
     assets = image_proc.PICTURE_DIR
     # create video
     _upload_single_image(session, client, type_="video")
-    out_post = {
-        "type": "video",
-        "title": "this is a title of a post",
-        "uploaded_images": ["abcdef"],
-        "content": (
-            "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed "
-            "do eiusmod tempor incididunt ut labore et dolore magna aliqua. Ut "
-            "enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi "
-            "ut aliquip ex ea commodo consequat. Duis aute irure dolor in "
-            "reprehenderit in voluptate velit esse cillum dolore eu fugiat nulla "
-            "pariatur. Excepteur sint occaecat cupidatat non proident, sunt in "
-            "culpa qui officia deserunt mollit anim id est laborum."
-        )
-    }
+    out_post = shared_data.mock_post(
+        type_="video",
+        with_content=True,
+        with_title=True,
+        with_image=True,
+    )
     resp = client.post(
-        f"/api/v1/posts/{shared_data.corna_info['domain_name']}/post",
+        _POST_URL,
         json=out_post
     )
     assert resp.status_code == 201
 
     expected_path = assets / "video" / "thi/sis/afa/kestringhash"
-    assert expected_path.exists()
-    assert len(expected_path.listdir()) == 1
-    for file in expected_path.listdir():
-        # assert we've saved some data successfully
-        assert os.stat(file).st_size >= 1024
+    entries = list(os.scandir(expected_path))
+    assert len(entries) == 1
+    # assert we've saved some data successfully
+    assert entries[0].stat().st_size >= 1024
 
-    image_basename = expected_path.listdir()[0].basename
+    image_basename = entries[0].name
     # ensure database relationships are correct
-    posts = session.query(models.PostTable).all()
-    assert len(posts) == 1
-
-    corna = (
-        session
-        .query(models.CornaTable)
-        .filter(
-            models.CornaTable.domain_name
-            == shared_data.corna_info["domain_name"]
-        )
-        .one()
-    )
-    assert len(corna.posts) == 1
-    post = session.query(models.PostTable).first()
-    vid = session.query(models.Media).first()
-    text = session.query(models.TextContent).first()
+    corna = _corna(session)
+    post = _only_post(session)
+    (vid,) = post.media
+    text = post.text
 
     # checking foreign key relationships
     assert post.corna_uuid == corna.uuid
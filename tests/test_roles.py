@@ -6,30 +6,54 @@ from corna.utils import get_utc_now, utils
 from tests import shared_data as shared
 
 
-def many_users_helper(session, number=50):
+# what `perms.perms` returns for a role without any permissions
+ALL_FALSE = {
+    "read": False,
+    "write": False,
+    "edit": False,
+    "delete": False,
+    "change_theme": False,
+    "change_permissions": False,
+    "comment": False,
+    "like": False,
+    "follow": False,
+}
 
-    for i in range(1, number + 1):
-        user = {
-            "email_address": f"azor_ahi_{i}@starkentaprise.wstro",
-            "password": "Dany",
-            "user_name": f"john_snow_{i}",
-        }
-        
-        session.add(
-            models.EmailTable(
-                email_address=user["email_address"],
-                password=user["password"],
-            )
-        )
 
-        session.add(
-            models.UserTable(
-                uuid=utils.get_uuid(),
-                email_address=user["email_address"],
-                username=user["user_name"],
-                date_created=get_utc_now(),
-            )
-        )
+def _expected(**overrides):
+    """Expected `perms.perms` output, e.g. `_expected(read=True)`."""
+    return {**ALL_FALSE, **overrides}
+
+
+def many_users_helper(session, number=50):
+    # every user shares a password, so hash it once through the model rather
+    # than paying for a (deliberately slow) password hash per user
+    password_hash = models.EmailTable(password="Dany").password_hash
+    emails = [
+        f"azor_ahi_{i}@starkentaprise.wstro" for i in range(1, number + 1)
+    ]
+    now = get_utc_now()
+
+    # emails first, users reference them by foreign key
+    session.bulk_insert_mappings(
+        models.EmailTable,
+        [
+            {"email_address": email, "password_hash": password_hash}
+            for email in emails
+        ],
+    )
+    session.bulk_insert_mappings(
+        models.UserTable,
+        [
+            {
+                "uuid": utils.get_uuid(),
+                "email_address": email,
+                "username": f"john_snow_{i}",
+                "date_created": now,
+            }
+            for i, email in enumerate(emails, start=1)
+        ],
+    )
 
     session.commit()
     assert session.query(models.UserTable).count() == number + 1
@@ -71,17 +95,7 @@ def test_create_role__default_perms(client, session, corna):
     assert role.permissions == 449  # default role
 
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected(read=True, comment=True, like=True, follow=True)
 
     assert perms.perms(role.permissions) == expected
 
@@ -109,17 +123,7 @@ def test_create_role__perm_does_not_exist(client, session, corna):
     assert role.permissions == 193
 
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": False,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected(read=True, comment=True, like=True)
 
     assert perms.perms(role.permissions) == expected
 
@@ -194,17 +198,7 @@ def test_create_role__banned_role(client, session, corna):
 
 
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": False,
-        "delete": False,
-        "edit": False,
-        "follow": False,
-        "like": False,
-        "read": False,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected()
 
     assert perms.perms(role.permissions) == expected
 
@@ -233,17 +227,7 @@ def test_update_role__add_write_to_default_role(client, session, corna):
 
     role = session.query(models.Role).first()
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected(read=True, comment=True, like=True, follow=True)
 
     assert perms.perms(role.permissions) == expected
 
@@ -263,17 +247,13 @@ def test_update_role__add_write_to_default_role(client, session, corna):
     role = session.query(models.Role).first()
 
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": True,
-    }
+    expected = _expected(
+        read=True,
+        write=True,
+        comment=True,
+        like=True,
+        follow=True,
+    )
 
     assert perms.perms(role.permissions) == expected
 
@@ -290,17 +270,7 @@ def test_update_role__perm_does_not_exist(client, session, corna):
 
     role = session.query(models.Role).first()
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected(read=True, comment=True, like=True, follow=True)
 
     assert perms.perms(role.permissions) == expected
 
@@ -320,17 +290,7 @@ def test_update_role__perm_does_not_exist(client, session, corna):
     role = session.query(models.Role).first()
 
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected(read=True, comment=True, like=True, follow=True)
 
     assert perms.perms(role.permissions) == expected
 
@@ -347,17 +307,7 @@ def test_update_role__corna_role_does_not_exist(client, session, corna):
     role = session.query(models.Role).first()
 
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected(read=True, comment=True, like=True, follow=True)
 
     assert perms.perms(role.permissions) == expected
 
@@ -435,17 +385,7 @@ def test_add_perm(client, session, corna):
 
     role = session.query(models.Role).first()
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected(read=True, comment=True, like=True, follow=True)
     assert perms.perms(role.permissions) == expected
 
     # add perm to role
@@ -462,17 +402,13 @@ def test_add_perm(client, session, corna):
     assert session.query(models.Role).count() == 1
     role = session.query(models.Role).first()
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": True,
-    }
+    expected = _expected(
+        read=True,
+        write=True,
+        comment=True,
+        like=True,
+        follow=True,
+    )
     assert perms.perms(role.permissions) == expected
 
 
@@ -488,17 +424,7 @@ def test_add_perm__add_same_perm(client, session, corna):
 
     role = session.query(models.Role).first()
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected(read=True, comment=True, like=True, follow=True)
     assert perms.perms(role.permissions) == expected
 
     # add same perm to role
@@ -546,17 +472,7 @@ def test_add_perm__perm_does_not_exist(client, session, corna):
 
     role = session.query(models.Role).first()
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected(read=True, comment=True, like=True, follow=True)
     assert perms.perms(role.permissions) == expected
 
     # add perm that doesn't exist
@@ -589,17 +505,7 @@ def test_remove_perm(client, session, corna):
 
     role = session.query(models.Role).first()
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected(read=True, comment=True, like=True, follow=True)
     assert perms.perms(role.permissions) == expected
 
     # add perm to role
@@ -616,17 +522,7 @@ def test_remove_perm(client, session, corna):
     assert session.query(models.Role).count() == 1
     role = session.query(models.Role).first()
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": False,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected(read=True, like=True, follow=True)
     assert perms.perms(role.permissions) == expected
 
 
@@ -642,17 +538,7 @@ def test_remove_perm__perm_does_not_exist(client, session, corna):
 
     role = session.query(models.Role).first()
     # check all permissions are correct
-    expected = {
-        "change_theme": False,
-        "comment": True,
-        "delete": False,
-        "edit": False,
-        "follow": True,
-        "like": True,
-        "read": True,
-        "change_permissions": False,
-        "write": False,
-    }
+    expected = _expected(read=True, comment=True, like=True, follow=True)
     assert perms.perms(role.permissions) == expected
 
     # add perm to role
@@ -1269,10 +1155,12 @@ def test_user_perm_list(client, session, corna):
         ]
     }
 
-    assert resp.json["permission"] == expected["permission"]
-    assert len(resp.json["users"]) == len(expected["users"])
+    # werkzeug re-parses the body on every `resp.json` access
+    data = resp.json
+    assert data["permission"] == expected["permission"]
+    assert len(data["users"]) == len(expected["users"])
     # lists are unstable i.e. the order can change so we make it a set
-    assert set(resp.json["users"]) == set(expected["users"])
+    assert set(data["users"]) == set(expected["users"])
 
 # ----------- test permissions i.e. is user allowed to interact with roles
 